@@ -5,25 +5,112 @@
 支持1天、7天、30天、90天、终生兑换码生成和验证
 """
 
+import asyncio
+import base64
 import os
+import queue
 import sqlite3
 import hashlib
+import logging
 import secrets
+import threading
 import time
-from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from cachetools import TTLCache
 from fastapi import FastAPI, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 import uvicorn
 
-app = FastAPI(title="游戏助手激活服务器", version="1.0.0")
+app = FastAPI(title="游戏助手激活服务器", version="1.0.0", default_response_class=ORJSONResponse)
+
+logger = logging.getLogger(__name__)
+
+DATABASE_PATH = 'activation.db'
+
+# SQL语句：统一定义为模块级常量，每个连接的语句缓存中每条语句只编译一次
+SQL_CLAIM_CODE = '''
+    UPDATE activation_codes
+    SET is_used = TRUE, used_by_device = ?, used_at = CURRENT_TIMESTAMP,
+        current_uses = current_uses + 1
+    WHERE code = ? AND is_used = FALSE AND current_uses < max_uses
+      AND (expires_at IS NULL OR expires_at >= ?)
+    RETURNING license_type, duration_days
+'''
+
+SQL_GET_CODE = '''
+    SELECT expires_at, current_uses, max_uses FROM activation_codes
+    WHERE code = ? AND is_used = FALSE
+'''
+
+# device_id 目前按原文写入激活记录。若日后出于隐私考虑改存哈希值，直接用 hashlib.sha256 即可：
+# CPython 的 hashlib 由 OpenSSL 实现，OpenSSL 1.1.1+ 会在运行时自动选用 SHA-NI（x86）
+# 或 ARMv8 SHA 扩展指令，哈希开销相对一次数据库往返可以忽略；部署时需确认所链接的 OpenSSL 版本
+# （python -c "import ssl; print(ssl.OPENSSL_VERSION)"）。
+SQL_INSERT_DEVICE = '''
+    INSERT INTO device_activations
+    (device_id, activation_code, license_type, expires_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(device_id) DO NOTHING
+'''
+
+SQL_GET_DEVICE = '''
+    SELECT license_type, expires_at FROM device_activations
+    WHERE device_id = ? AND is_active = TRUE AND expires_at >= ?
+'''
+
+SQL_TOUCH_DEVICE = '''
+    UPDATE device_activations
+    SET last_seen = datetime(?, 'unixepoch')
+    WHERE device_id = ?
+'''
+
+SQL_EXPIRE_DEVICES = '''
+    UPDATE device_activations
+    SET is_active = FALSE
+    WHERE is_active = TRUE AND expires_at < ?
+'''
+
+SQL_LAST_CODE_ID = "SELECT IFNULL(MAX(id), 0) FROM activation_codes"
+
+SQL_INSERT_CODE = '''
+    INSERT OR IGNORE INTO activation_codes
+    (code, license_type, duration_days, expires_at, created_by)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+SQL_CODES_AFTER_ID = "SELECT code FROM activation_codes WHERE id > ? ORDER BY id"
+
+# 兑换码与设备统计合并为一次查询，kind 列区分来源；设备行的第三个计数列恒为NULL
+SQL_STATS = '''
+    SELECT 'code' as kind, license_type,
+           COUNT(*) as total,
+           COUNT(*) FILTER (WHERE is_used = TRUE) as used,
+           COUNT(*) FILTER (WHERE is_used = FALSE) as unused
+    FROM activation_codes
+    GROUP BY license_type
+    UNION ALL
+    SELECT 'device', license_type,
+           COUNT(*),
+           COUNT(*) FILTER (WHERE is_active = TRUE),
+           NULL
+    FROM device_activations
+    GROUP BY license_type
+    ORDER BY 1, 2
+'''
 
 # 数据库初始化
 def init_database():
     """初始化数据库"""
-    conn = sqlite3.connect('activation.db')
+    conn = sqlite3.connect(DATABASE_PATH)
     cursor = conn.cursor()
     
+    # WAL模式：读写互不阻塞，提交时无需fsync主库文件（journal_mode持久化在库文件中）
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    
     # 创建兑换码表
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS activation_codes (
@@ -35,7 +122,7 @@ def init_database():
             used_by_device TEXT,
             used_at TIMESTAMP,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
+            expires_at INTEGER,
             max_uses INTEGER DEFAULT 1,
             current_uses INTEGER DEFAULT 0,
             created_by TEXT DEFAULT 'system'
@@ -50,13 +137,27 @@ def init_database():
             activation_code TEXT NOT NULL,
             license_type TEXT NOT NULL,
             activated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            expires_at TIMESTAMP,
+            expires_at INTEGER,
             last_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             is_active BOOLEAN DEFAULT TRUE,
             total_usage_days INTEGER DEFAULT 0
         )
     ''')
     
+    # code、device_id 上的 UNIQUE 约束已自带索引，按兑换码、设备查询无需另建索引
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_dev_expires
+        ON device_activations(expires_at)
+    ''')
+    
+    # expires_at 改为Unix时间戳（秒）存储；旧库中的本地时间ISO字符串就地转换
+    for table in ('activation_codes', 'device_activations'):
+        cursor.execute(f'''
+            UPDATE {table} 
+            SET expires_at = CAST(strftime('%s', expires_at, 'utc') AS INTEGER)
+            WHERE typeof(expires_at) = 'text'
+        ''')
+    
     conn.commit()
     conn.close()
 
@@ -69,7 +170,7 @@ class ActivationResponse(BaseModel):
     success: bool
     message: str
     license_type: Optional[str] = None
-    expires_at: Optional[str] = None
+    expires_at: Optional[datetime] = None
     days_remaining: Optional[int] = None
 
 class VerificationRequest(BaseModel):
@@ -78,7 +179,7 @@ class VerificationRequest(BaseModel):
 class VerificationResponse(BaseModel):
     valid: bool
     license_type: Optional[str] = None
-    expires_at: Optional[str] = None
+    expires_at: Optional[datetime] = None
     days_remaining: Optional[int] = None
     is_trial: bool = False
 
@@ -88,6 +189,9 @@ class GenerateCodeRequest(BaseModel):
     created_by: str = "admin"
 
 # 工具函数
+# 兑换码格式为 "<授权类型>_<随机串>"，随机串中不含下划线
+LICENSE_TYPES = frozenset({"TRIAL_1D", "WEEK_7D", "MONTH_1M", "MONTH_3M", "LIFETIME"})
+
 def generate_activation_code(license_type: str) -> str:
     """生成兑换码"""
     prefix_map = {
@@ -99,7 +203,8 @@ def generate_activation_code(license_type: str) -> str:
     }
     
     prefix = prefix_map.get(license_type, "UNKNOWN")
-    random_part = secrets.token_hex(4).upper()
+    # 5字节随机数的base32编码恰好8个字符（A-Z2-7，无填充），熵为40位
+    random_part = base64.b32encode(secrets.token_bytes(5)).decode()
     return f"{prefix}_{random_part}"
 
 def get_duration_days(license_type: str) -> int:
@@ -113,256 +218,399 @@ def get_duration_days(license_type: str) -> int:
     }
     return duration_map.get(license_type, 0)
 
-def calculate_expiry_date(duration_days: int) -> datetime:
-    """计算过期时间"""
-    if duration_days >= 36500:  # 终生
-        return datetime.now() + timedelta(days=36500)
-    return datetime.now() + timedelta(days=duration_days)
+def timestamp_to_datetime(timestamp: int) -> datetime:
+    """Unix时间戳转为API返回的本地时间"""
+    return datetime.fromtimestamp(timestamp)
+
+def calculate_expiry_ts(duration_days: int) -> int:
+    """计算过期时间（Unix时间戳，秒）"""
+    # 终生授权按36500天计
+    return int(time.time()) + min(duration_days, 36500) * 86400
 
-def get_db_connection():
-    """获取数据库连接"""
-    conn = sqlite3.connect('activation.db')
+def open_db_connection(database: str = DATABASE_PATH, read_only: bool = False) -> sqlite3.Connection:
+    """打开数据库连接并应用连接级PRAGMA"""
+    if read_only:
+        conn = sqlite3.connect(f"file:{database}?mode=ro", uri=True,
+                               check_same_thread=False, cached_statements=256)
+    else:
+        conn = sqlite3.connect(database, check_same_thread=False, cached_statements=256)
     conn.row_factory = sqlite3.Row
+    # 以下PRAGMA为连接级设置，每个新连接都需要重新执行
+    conn.execute("PRAGMA busy_timeout=5000")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-64000")
+    conn.execute("PRAGMA mmap_size=30000000000")
     return conn
 
+class SqlitePool:
+    """线程安全的SQLite连接池，启动时预先打开固定数量的连接并在请求间复用"""
+
+    def __init__(self, database: str = DATABASE_PATH, pool_size: int = 10, read_only: bool = False):
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(open_db_connection(database, read_only=read_only))
+
+    @contextmanager
+    def acquire(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接，用完后归还连接池"""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            # 防止未提交的事务随连接回到池中
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+
+    def close(self):
+        """关闭池中所有连接"""
+        while True:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+class SqliteWriter:
+    """单一写连接：SQLite同一时刻只允许一个写事务，用锁串行化所有写操作"""
+
+    def __init__(self, database: str = DATABASE_PATH):
+        self._conn = open_db_connection(database)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self) -> Iterator[sqlite3.Connection]:
+        """独占写连接，用完后释放写锁"""
+        with self._lock:
+            try:
+                yield self._conn
+            finally:
+                if self._conn.in_transaction:
+                    self._conn.rollback()
+
+    def close(self):
+        """关闭写连接"""
+        with self._lock:
+            self._conn.close()
+
+# WAL模式下读者之间、读者与写者之间互不阻塞，只有写者之间需要串行
+db_writer: Optional[SqliteWriter] = None
+db_readers: Optional[SqlitePool] = None
+
+# 验证结果缓存：客户端心跳会反复验证同一设备，缓存命中时不访问数据库
+VERIFY_CACHE_TTL = 30
+LAST_SEEN_FLUSH_INTERVAL = 1
+EXPIRE_SWEEP_INTERVAL = 60
+
+verification_cache: "TTLCache[str, Tuple[str, int]]" = TTLCache(maxsize=100_000, ttl=VERIFY_CACHE_TTL)
+verification_cache_lock = threading.Lock()
+# 设备访问记录 (device_id, 访问时间戳)，由后台任务定期批量写回 last_seen；
+# 验证接口运行在线程池中，因此使用线程安全的 SimpleQueue
+last_seen_queue: "queue.SimpleQueue[Tuple[str, int]]" = queue.SimpleQueue()
+background_tasks: List[asyncio.Task] = []
+# 通知后台任务退出；在启动时创建，绑定到服务所用的事件循环
+background_stop: Optional[asyncio.Event] = None
+
+def load_active_device(device_id: str) -> Optional[Tuple[str, int]]:
+    """查询有效设备的 (license_type, expires_at)，优先命中缓存"""
+    with verification_cache_lock:
+        device_record = verification_cache.get(device_id)
+    if device_record is not None:
+        return device_record
+    
+    with db_readers.acquire() as conn:
+        row = conn.execute(SQL_GET_DEVICE, (device_id, int(time.time()))).fetchone()
+    if row is None:
+        return None
+    
+    device_record = tuple(row)
+    with verification_cache_lock:
+        verification_cache[device_id] = device_record
+    return device_record
+
+def flush_last_seen():
+    """把队列中累积的设备访问时间在一个事务内批量写回数据库"""
+    last_seen: Dict[str, int] = {}
+    while True:
+        try:
+            device_id, seen_at = last_seen_queue.get_nowait()
+        except queue.Empty:
+            break
+        # 同一设备只保留最新的访问时间（失败重新入队的旧记录可能排在新记录之后）
+        last_seen[device_id] = max(seen_at, last_seen.get(device_id, 0))
+    if not last_seen:
+        return
+    
+    try:
+        with db_writer.acquire() as conn:
+            conn.executemany(SQL_TOUCH_DEVICE,
+                             [(seen_at, device_id) for device_id, seen_at in last_seen.items()])
+            conn.commit()
+    except Exception:
+        # 写入失败（如多进程争用写锁超时）时放回队列，并入下一次写回
+        for device_id, seen_at in last_seen.items():
+            last_seen_queue.put((device_id, seen_at))
+        raise
+
+def expire_devices():
+    """批量停用已过期的设备"""
+    with db_writer.acquire() as conn:
+        conn.execute(SQL_EXPIRE_DEVICES, (int(time.time()),))
+        conn.commit()
+
+async def run_periodically(interval: float, func):
+    """后台任务：每隔 interval 秒在线程池中执行一次 func，直到 background_stop 被置位"""
+    while True:
+        try:
+            await asyncio.wait_for(background_stop.wait(), interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(func)
+        except Exception:
+            logger.exception("后台任务 %s 执行失败", func.__name__)
+
+@app.on_event("startup")
+async def on_startup():
+    """启动时创建写连接、只读连接池和后台维护任务"""
+    global db_writer, db_readers, background_stop
+    db_writer = SqliteWriter(DATABASE_PATH)
+    db_readers = SqlitePool(DATABASE_PATH, pool_size=10, read_only=True)
+    background_stop = asyncio.Event()
+    background_tasks.append(asyncio.create_task(run_periodically(LAST_SEEN_FLUSH_INTERVAL, flush_last_seen)))
+    background_tasks.append(asyncio.create_task(run_periodically(EXPIRE_SWEEP_INTERVAL, expire_devices)))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """写回剩余的访问时间，关闭所有连接，并合并WAL日志、截断-wal文件"""
+    global db_writer, db_readers
+    # 通知后台任务退出并等待其结束：不取消任务，保证线程池中正在执行的写回完成后再关闭写连接
+    if background_stop is not None:
+        background_stop.set()
+    await asyncio.gather(*background_tasks)
+    background_tasks.clear()
+    try:
+        flush_last_seen()
+    except Exception:
+        # 写回失败（如其他进程占用写锁）不应阻止后续关闭连接和checkpoint
+        logger.exception("关闭时写回设备访问时间失败")
+    if db_readers is not None:
+        db_readers.close()
+        db_readers = None
+    if db_writer is not None:
+        db_writer.close()
+        db_writer = None
+    conn = sqlite3.connect(DATABASE_PATH)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+
+def get_code_rejection_reason(conn: sqlite3.Connection, code: str) -> str:
+    """兑换码未能占用时，查询具体原因"""
+    code_record = conn.execute(SQL_GET_CODE, (code,)).fetchone()
+    if not code_record:
+        return "兑换码不存在或已被使用"
+    expires_at, current_uses, max_uses = code_record
+    
+    if expires_at and expires_at < int(time.time()):
+        return "兑换码已过期"
+    if current_uses >= max_uses:
+        return "兑换码使用次数已达上限"
+    return "兑换码不存在或已被使用"
+
 # API端点
 @app.post("/api/activate", response_model=ActivationResponse)
-async def activate_device(request: ActivationRequest):
+def activate_device(request: ActivationRequest):
     """激活设备"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    # 验证兑换码格式（纯字符串检查，不占用写连接）
+    if request.activation_code.rpartition('_')[0] not in LICENSE_TYPES:
+        return ActivationResponse(
+            success=False,
+            message="兑换码格式错误"
+        )
     
-    try:
-        # 验证兑换码格式
-        if not request.activation_code.startswith(('TRIAL_1D_', 'WEEK_7D_', 'MONTH_1M_', 'MONTH_3M_', 'LIFETIME_')):
-            return ActivationResponse(
-                success=False,
-                message="兑换码格式错误"
-            )
-        
-        # 查询兑换码
-        cursor.execute('''
-            SELECT * FROM activation_codes 
-            WHERE code = ? AND is_used = FALSE
-        ''', (request.activation_code,))
-        
-        code_record = cursor.fetchone()
-        if not code_record:
-            return ActivationResponse(
-                success=False,
-                message="兑换码不存在或已被使用"
-            )
-        
-        # 检查是否过期
-        if code_record['expires_at'] and datetime.fromisoformat(code_record['expires_at']) < datetime.now():
-            return ActivationResponse(
-                success=False,
-                message="兑换码已过期"
-            )
-        
-        # 检查使用次数
-        if code_record['current_uses'] >= code_record['max_uses']:
-            return ActivationResponse(
-                success=False,
-                message="兑换码使用次数已达上限"
-            )
-        
-        # 检查设备是否已激活
-        cursor.execute('''
-            SELECT * FROM device_activations 
-            WHERE device_id = ? AND is_active = TRUE
-        ''', (request.device_id,))
-        
-        existing_device = cursor.fetchone()
-        if existing_device:
+    with db_writer.acquire() as conn:
+        try:
+            # 立即获取写锁，避免事务中途升级写锁时遇到SQLITE_BUSY
+            conn.execute("BEGIN IMMEDIATE")
+            
+            # 原子地占用兑换码：未使用、未过期、未达使用上限才会被更新
+            code_record = conn.execute(SQL_CLAIM_CODE, (request.device_id, request.activation_code,
+                                                        int(time.time()))).fetchone()
+            
+            if code_record:
+                license_type, duration_days = code_record
+                
+                # 计算过期时间
+                expires_at = calculate_expiry_ts(duration_days)
+                
+                # 创建设备激活记录，仅在 device_id 唯一约束冲突（设备已激活）时跳过插入
+                inserted = conn.execute(SQL_INSERT_DEVICE, (request.device_id, request.activation_code,
+                                                            license_type, expires_at)).rowcount
+                
+                if inserted == 0:
+                    conn.rollback()
+                    return ActivationResponse(
+                        success=False,
+                        message="该设备已激活，请勿重复激活"
+                    )
+                
+                conn.commit()
+                
+                return ActivationResponse(
+                    success=True,
+                    message="激活成功",
+                    license_type=license_type,
+                    expires_at=timestamp_to_datetime(expires_at),
+                    days_remaining=duration_days
+                )
+            
+            conn.rollback()
+            
+        except Exception as e:
+            conn.rollback()
             return ActivationResponse(
                 success=False,
-                message="该设备已激活，请勿重复激活"
+                message=f"激活失败: {str(e)}"
             )
-        
-        # 计算过期时间
-        duration_days = code_record['duration_days']
-        expires_at = calculate_expiry_date(duration_days)
-        
-        # 更新兑换码使用状态
-        cursor.execute('''
-            UPDATE activation_codes 
-            SET is_used = TRUE, used_by_device = ?, used_at = CURRENT_TIMESTAMP,
-                current_uses = current_uses + 1
-            WHERE code = ?
-        ''', (request.device_id, request.activation_code))
-        
-        # 创建设备激活记录
-        cursor.execute('''
-            INSERT INTO device_activations 
-            (device_id, activation_code, license_type, expires_at)
-            VALUES (?, ?, ?, ?)
-        ''', (request.device_id, request.activation_code, 
-              code_record['license_type'], expires_at.isoformat()))
-        
-        conn.commit()
-        
-        return ActivationResponse(
-            success=True,
-            message="激活成功",
-            license_type=code_record['license_type'],
-            expires_at=expires_at.isoformat(),
-            days_remaining=duration_days
-        )
-        
+    
+    # 兑换码未能占用：释放写连接后在只读连接上查询具体原因
+    try:
+        with db_readers.acquire() as conn:
+            message = get_code_rejection_reason(conn, request.activation_code)
     except Exception as e:
-        conn.rollback()
-        return ActivationResponse(
-            success=False,
-            message=f"激活失败: {str(e)}"
-        )
-    finally:
-        conn.close()
+        message = f"激活失败: {str(e)}"
+    
+    return ActivationResponse(
+        success=False,
+        message=message
+    )
 
-@app.post("/api/verify", response_model=VerificationResponse)
-async def verify_device(request: VerificationRequest):
+# 心跳热点接口：直接构造dict交给orjson序列化，跳过响应模型的构造与校验；
+# VerificationResponse 仅用于生成接口文档
+INVALID_VERIFICATION = {
+    "valid": False,
+    "license_type": None,
+    "expires_at": None,
+    "days_remaining": None,
+    "is_trial": False
+}
+
+@app.post("/api/verify", response_model=None, responses={200: {"model": VerificationResponse}})
+def verify_device(request: VerificationRequest):
     """验证设备激活状态"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
         # 查询设备激活状态
-        cursor.execute('''
-            SELECT * FROM device_activations 
-            WHERE device_id = ? AND is_active = TRUE
-        ''', (request.device_id,))
-        
-        device_record = cursor.fetchone()
+        device_record = load_active_device(request.device_id)
         if not device_record:
-            return VerificationResponse(
-                valid=False,
-                is_trial=False
-            )
+            return ORJSONResponse(INVALID_VERIFICATION)
+        license_type, expires_at = device_record
         
         # 检查是否过期
-        expires_at = datetime.fromisoformat(device_record['expires_at'])
-        now = datetime.now()
+        now = int(time.time())
         
         if expires_at < now:
-            # 过期，更新状态
-            cursor.execute('''
-                UPDATE device_activations 
-                SET is_active = FALSE 
-                WHERE device_id = ?
-            ''', (request.device_id,))
-            conn.commit()
+            # 缓存中的记录已过期；is_active 状态由后台任务统一更新
+            with verification_cache_lock:
+                verification_cache.pop(request.device_id, None)
             
-            return VerificationResponse(
-                valid=False,
-                is_trial=False
-            )
+            return ORJSONResponse(INVALID_VERIFICATION)
         
-        # 更新最后访问时间
-        cursor.execute('''
-            UPDATE device_activations 
-            SET last_seen = CURRENT_TIMESTAMP 
-            WHERE device_id = ?
-        ''', (request.device_id,))
-        conn.commit()
+        # 记录访问，最后访问时间由后台任务批量写回，不等待磁盘
+        last_seen_queue.put((request.device_id, now))
         
         # 计算剩余天数
-        days_remaining = (expires_at - now).days
-        is_trial = device_record['license_type'] == 'TRIAL_1D'
+        days_remaining = (expires_at - now) // 86400
+        is_trial = license_type == 'TRIAL_1D'
         
-        return VerificationResponse(
-            valid=True,
-            license_type=device_record['license_type'],
-            expires_at=device_record['expires_at'],
-            days_remaining=days_remaining,
-            is_trial=is_trial
-        )
+        return ORJSONResponse({
+            "valid": True,
+            "license_type": license_type,
+            "expires_at": timestamp_to_datetime(expires_at),
+            "days_remaining": days_remaining,
+            "is_trial": is_trial
+        })
         
     except Exception as e:
-        return VerificationResponse(
-            valid=False,
-            is_trial=False
-        )
-    finally:
-        conn.close()
+        return ORJSONResponse(INVALID_VERIFICATION)
 
 @app.post("/api/admin/generate-codes")
-async def generate_codes(request: GenerateCodeRequest):
+def generate_codes(request: GenerateCodeRequest):
     """生成兑换码（管理员功能）"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        duration_days = get_duration_days(request.license_type)
-        if duration_days == 0:
-            raise HTTPException(status_code=400, detail="无效的授权类型")
+    with db_writer.acquire() as conn:
+        cursor = conn.cursor()
         
-        codes = []
-        for _ in range(request.count):
-            code = generate_activation_code(request.license_type)
-            expires_at = calculate_expiry_date(duration_days)
+        try:
+            duration_days = get_duration_days(request.license_type)
+            if duration_days == 0:
+                raise HTTPException(status_code=400, detail="无效的授权类型")
             
-            cursor.execute('''
-                INSERT INTO activation_codes 
-                (code, license_type, duration_days, expires_at, created_by)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (code, request.license_type, duration_days, 
-                  expires_at.isoformat(), request.created_by))
+            # 同一批兑换码的过期时间相同，只计算一次
+            expires_at = calculate_expiry_ts(duration_days)
+            codes = []
             
-            codes.append(code)
-        
-        conn.commit()
-        
-        return {
-            "success": True,
-            "message": f"成功生成 {len(codes)} 个兑换码",
-            "codes": codes,
-            "license_type": request.license_type,
-            "duration_days": duration_days
-        }
-        
-    except Exception as e:
-        conn.rollback()
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+            # 单个事务内批量插入：SQL只解析一次，逐行绑定参数。
+            # 与已有兑换码重复的行被忽略，下一轮补足，不会因个别冲突中断整个事务
+            conn.execute("BEGIN IMMEDIATE")
+            while len(codes) < request.count:
+                cursor.execute(SQL_LAST_CODE_ID)
+                last_id = cursor.fetchone()[0]
+                
+                batch = [generate_activation_code(request.license_type)
+                         for _ in range(request.count - len(codes))]
+                cursor.executemany(SQL_INSERT_CODE,
+                                   [(code, request.license_type, duration_days, expires_at, request.created_by)
+                                    for code in batch])
+                
+                if cursor.rowcount == len(batch):
+                    codes.extend(batch)
+                else:
+                    # 有冲突时，按自增id取回本轮实际插入的兑换码
+                    cursor.execute(SQL_CODES_AFTER_ID, (last_id,))
+                    codes.extend(row[0] for row in cursor.fetchall())
+            
+            conn.commit()
+            
+            return {
+                "success": True,
+                "message": f"成功生成 {len(codes)} 个兑换码",
+                "codes": codes,
+                "license_type": request.license_type,
+                "duration_days": duration_days
+            }
+            
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/admin/stats")
-async def get_statistics():
+def get_statistics():
     """获取统计信息（管理员功能）"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # 兑换码统计
-        cursor.execute('''
-            SELECT license_type, 
-                   COUNT(*) as total,
-                   SUM(CASE WHEN is_used = TRUE THEN 1 ELSE 0 END) as used,
-                   SUM(CASE WHEN is_used = FALSE THEN 1 ELSE 0 END) as unused
-            FROM activation_codes 
-            GROUP BY license_type
-        ''')
-        code_stats = cursor.fetchall()
-        
-        # 设备激活统计
-        cursor.execute('''
-            SELECT license_type,
-                   COUNT(*) as total_devices,
-                   SUM(CASE WHEN is_active = TRUE THEN 1 ELSE 0 END) as active_devices
-            FROM device_activations 
-            GROUP BY license_type
-        ''')
-        device_stats = cursor.fetchall()
-        
-        return {
-            "code_statistics": [dict(row) for row in code_stats],
-            "device_statistics": [dict(row) for row in device_stats]
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+    with db_readers.acquire() as conn:
+        try:
+            code_stats = []
+            device_stats = []
+            for kind, license_type, total, counted, unused in conn.execute(SQL_STATS):
+                if kind == 'code':
+                    # 兑换码统计
+                    code_stats.append({"license_type": license_type, "total": total,
+                                       "used": counted, "unused": unused})
+                else:
+                    # 设备激活统计
+                    device_stats.append({"license_type": license_type, "total_devices": total,
+                                         "active_devices": counted})
+            
+            # 直接返回响应对象，跳过 jsonable_encoder 的逐字段转换
+            return ORJSONResponse({
+                "code_statistics": code_stats,
+                "device_statistics": device_stats
+            })
+            
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/")
 async def root():
@@ -370,13 +618,17 @@ async def root():
     return {"message": "游戏助手激活服务器运行中", "version": "1.0.0"}
 
 if __name__ == "__main__":
-    # 初始化数据库
+    # 初始化数据库（在fork工作进程之前完成，各进程启动时只打开连接）
     init_database()
     
-    # 启动服务器
+    # 启动服务器：多进程利用全部CPU核心，uvloop/httptools 替换纯Python的事件循环和HTTP解析。
+    # 各工作进程拥有独立的连接池和缓存，进程间的写入由SQLite的WAL锁和 busy_timeout 协调
     uvicorn.run(
-        app, 
+        "activation_server:app", 
         host="0.0.0.0", 
         port=8000,
+        workers=os.cpu_count() or 1,
+        loop="uvloop",
+        http="httptools",
         log_level="info"
     )